@@ -52,14 +52,18 @@ class Predicter():
         self.vocab_path = options["vocab_path"]
         self.min_len = options["min_len"]
         self.test_ratio = options["test_ratio"]
-
-    def detect_logkey_anomaly(self, output, label):
-        num_anomaly = 0
-        for i in range(len(label)):
-            predicted = torch.argsort(output[i])[-self.num_candidates:].clone().detach().cpu()
-            if label[i] not in predicted:
-                num_anomaly += 1
-        return num_anomaly
+        # number of sliding windows scored per forward pass in predict_unsupervised
+        self.predict_batch_size = options.get("predict_batch_size", 4096)
+
+    def undetected_logkeys(self, output, label):
+        """
+        :param output: batch_size x num_classes scores
+        :param label: batch_size next log keys
+        :return: batch_size bool tensor, True if label is not among the top num_candidates
+        """
+        num_candidates = min(self.num_candidates, output.size(-1))
+        predicted = torch.topk(output, num_candidates, dim=-1).indices
+        return ~(predicted == label.to(predicted.device).view(-1, 1)).any(dim=-1)
 
     def compute_anomaly(self, results, threshold=0):
         total_errors = 0
@@ -93,6 +97,71 @@ class Predicter():
                 res = [th, TP, TN, FP, FN, P, R, F1]
         return res
 
+    @staticmethod
+    def parse_session(line, scale=None, min_len=0):
+        line = [ln.split(",") for ln in line.split()]
+
+        if len(line) < min_len:
+            return None
+
+        line = np.array(line)
+        # if time duration exists in data
+        if line.shape[1] == 2:
+            tim = line[:, 1].astype(float)
+            tim[0] = 0
+            logkey = line[:, 0]
+        else:
+            logkey = line.squeeze()
+            # if time duration doesn't exist, then create a zero array for time
+            tim = np.zeros(logkey.shape)
+
+        if scale is not None:
+            tim = np.array(tim).reshape(-1,1)
+            tim = scale.transform(tim).reshape(-1).tolist()
+
+        return logkey.tolist(), np.asarray(tim).tolist()
+
+    def window_features(self, logs, start, end):
+        features = []
+        if self.sequentials:
+            features.append(torch.as_tensor(np.stack(logs['Sequentials'][start:end]), dtype=torch.long))
+        if self.quantitatives:
+            features.append(torch.as_tensor(np.stack(logs['Quantitatives'][start:end]), dtype=torch.float))
+        if self.semantics:
+            features.append(torch.as_tensor(np.array(logs['Semantics'][start:end]), dtype=torch.float))
+        if self.parameters:
+            features.append(torch.as_tensor(np.array(logs['Parameters'][start:end]), dtype=torch.float))
+        return [f.to(self.device) for f in features]
+
+    def session_windows(self, logkeys):
+        # sliding_window yields max(len, window_size) + 1 - window_size windows per session
+        return max(len(logkeys), self.window_size) + 1 - self.window_size
+
+    def score_sessions(self, model, sessions, vocab):
+        """
+        score the sliding windows of many sessions in large batches
+        :param sessions: list of (logkeys, times)
+        :return: per session number of undetected log keys and number of predicted log keys
+        """
+        logkeys, times = [s[0] for s in sessions], [s[1] for s in sessions]
+        logs, labels = sliding_window((logkeys, times), vocab, window_size=self.window_size, is_train=False)
+
+        num_windows = np.array([self.session_windows(k) for k in logkeys])
+        # windows are scattered back by position, so the counts must line up with sliding_window
+        assert num_windows.sum() == len(labels), \
+            "sliding_window produced {} windows, expected {}".format(len(labels), num_windows.sum())
+        session_index = np.repeat(np.arange(len(sessions)), num_windows)
+        num_anomaly = np.zeros(len(sessions), dtype=np.int64)
+        labels = torch.as_tensor(labels)
+
+        for start in range(0, len(labels), self.predict_batch_size):
+            end = min(start + self.predict_batch_size, len(labels))
+            output = model(features=self.window_features(logs, start, end), device=self.device)
+            undetected = self.undetected_logkeys(output, labels[start:end]).cpu().numpy()
+            np.add.at(num_anomaly, session_index[start:end], undetected)
+
+        return num_anomaly.tolist(), num_windows.tolist()
+
     def unsupervised_helper(self, model, data_iter, vocab, data_type, scale=None, min_len=0):
         test_results = []
         normal_errors = []
@@ -100,66 +169,45 @@ class Predicter():
         num_test = len(data_iter)
         rand_index = torch.randperm(num_test)
         rand_index = rand_index[:int(num_test * self.test_ratio)]
+        # boolean mask instead of `idx in rand_index`, which scans the tensor for every line
+        is_sampled = np.zeros(num_test, dtype=bool)
+        is_sampled[rand_index.numpy()] = True
+
+        pending_idx, pending_sessions, pending_windows = [], [], 0
+
+        def flush():
+            nonlocal pending_windows
+            num_anomaly, num_predicted = self.score_sessions(model, pending_sessions, vocab)
+            for idx, n_anomaly, n_predicted in zip(pending_idx, num_anomaly, num_predicted):
+                # result for line at idx
+                result = {"logkey_anomaly": n_anomaly,
+                          "predicted_logkey": n_predicted
+                          }
+                test_results.append(result)
+                if idx < 10 or idx % 1000 == 0:
+                    print(data_type, result)
+            pending_idx.clear()
+            pending_sessions.clear()
+            pending_windows = 0
 
         with torch.no_grad():
             for idx, line in tqdm(enumerate(data_iter)):
-                if idx not in rand_index:
+                if not is_sampled[idx]:
                     continue
 
-                line = [ln.split(",") for ln in line.split()]
-
-                if len(line) < min_len:
+                session = self.parse_session(line, scale=scale, min_len=min_len)
+                if session is None:
                     continue
 
-                line = np.array(line)
-                # if time duration exists in data
-                if line.shape[1] == 2:
-                    tim = line[:, 1].astype(float)
-                    tim[0] = 0
-                    logkey = line[:, 0]
-                else:
-                    logkey = line.squeeze()
-                    # if time duration doesn't exist, then create a zero array for time
-                    tim = np.zeros(logkey.shape)
-
-                if scale is not None:
-                    tim = np.array(tim).reshape(-1,1)
-                    tim = scale.transform(tim).reshape(-1).tolist()
-
-                logkeys, times = [logkey.tolist()], [tim.tolist()] # add next axis
-
-                logs, labels = sliding_window((logkeys, times), vocab, window_size=self.window_size, is_train=False)
-                dataset = log_dataset(logs=logs,
-                                        labels=labels,
-                                        seq=self.sequentials,
-                                        quan=self.quantitatives,
-                                        sem=self.semantics,
-                                        param=self.parameters)
-                data_loader = DataLoader(dataset,
-                                               batch_size=min(len(dataset), 128),
-                                               shuffle=True,
-                                               pin_memory=True)
-                # batch_size = len(dataset)
-                num_logkey_anomaly = 0
-                num_predicted_logkey = 0
-                for _, (log, label) in enumerate(data_loader):
-                    features = []
-                    for value in log.values():
-                        features.append(value.clone().detach().to(self.device))
-
-                    output = model(features=features, device=self.device)
-
-                    num_predicted_logkey += len(label)
-
-                    num_logkey_anomaly += self.detect_logkey_anomaly(output, label)
+                pending_idx.append(idx)
+                pending_sessions.append(session)
+                pending_windows += self.session_windows(session[0])
+                # pack windows of many sessions before scoring
+                if pending_windows >= self.predict_batch_size:
+                    flush()
 
-                # result for line at idx
-                result = {"logkey_anomaly":num_logkey_anomaly,
-                          "predicted_logkey": num_predicted_logkey
-                          }
-                test_results.append(result)
-                if idx < 10 or idx % 1000 == 0:
-                    print(data_type, result)
+            if pending_sessions:
+                flush()
 
             return test_results, normal_errors
 
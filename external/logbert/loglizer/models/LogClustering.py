@@ -13,6 +13,7 @@ Reference:
 
 import numpy as np
 import pprint
+from scipy import sparse as sp
 from scipy.special import expit
 from numpy import linalg as LA
 from scipy.cluster.hierarchy import linkage, fcluster
@@ -22,7 +23,8 @@ from ..utils import metrics
 
 class LogClustering(object):
 
-    def __init__(self, max_dist=0.3, anomaly_threshold=0.3, mode='online', num_bootstrap_samples=1000):
+    def __init__(self, max_dist=0.3, anomaly_threshold=0.3, mode='online', num_bootstrap_samples=1000,
+                 batch_size=1000):
         """
         Attributes
         ----------
@@ -34,6 +36,8 @@ class LogClustering(object):
             representatives: ndarray, the representative samples of clusters, of shape 
                 num_clusters-by-num_events
             cluster_size_dict: dict, the size of each cluster, used to update representatives online 
+            batch_size: int, number of instances whose distances to the representatives are computed
+                with one matrix product during online clustering and prediction
         """
         self.max_dist = max_dist
         self.anomaly_threshold = anomaly_threshold
@@ -41,16 +45,20 @@ class LogClustering(object):
         self.num_bootstrap_samples = num_bootstrap_samples
         self.representatives = list()
         self.cluster_size_dict = dict()
+        self.batch_size = batch_size
+        # representatives stacked as rows, with their L2 norms, for matrix distance computation
+        self._rep_matrix = None
+        self._rep_norms = None
 
     def fit(self, X):   
         print('====== Model summary ======')         
         if self.mode == 'offline':
             # The offline mode can process about 10K samples only due to huge memory consumption.
-            self._offline_clustering(X)
+            self._offline_clustering(self._dense(X))
         elif self.mode == 'online':
             # Bootstrapping phase
             if self.num_bootstrap_samples > 0:
-                X_bootstrap = X[0:self.num_bootstrap_samples, :]
+                X_bootstrap = self._dense(X[0:self.num_bootstrap_samples, :])
                 self._offline_clustering(X_bootstrap)
             # Online learning phase
             if X.shape[0] > self.num_bootstrap_samples:
@@ -58,10 +66,14 @@ class LogClustering(object):
 
     def predict(self, X):
         y_pred = np.zeros(X.shape[0])
-        for i in range(X.shape[0]):
-            min_dist, min_index = self._get_min_cluster_dist(X[i, :])
-            if min_dist > self.anomaly_threshold:
-                y_pred[i] = 1
+        self._stack_representatives()
+        if self._rep_matrix is None:
+            y_pred[:] = 1
+            return y_pred
+        for start in range(0, X.shape[0], self.batch_size):
+            X_batch = self._dense(X[start:start + self.batch_size, :])
+            dist = self._cosine_dist(X_batch, self._rep_matrix, self._rep_norms)
+            y_pred[start:start + X_batch.shape[0]] = dist.min(axis=1) > self.anomaly_threshold
         return y_pred
 
     def evaluate(self, X, y_true):
@@ -93,25 +105,77 @@ class LogClustering(object):
 
     def _online_clustering(self, X):
         print("Starting online clustering...")
-        for i in range(self.num_bootstrap_samples, X.shape[0]):
-            if (i + 1) % 2000 == 0:
-                print('Processed {} instances.'.format(i + 1))
-            instance_vec = X[i, :]
-            if len(self.representatives) > 0:
-                min_dist, clu_id = self._get_min_cluster_dist(instance_vec)
-                if min_dist <= self.max_dist:
-                    self.cluster_size_dict[clu_id] += 1
-                    self.representatives[clu_id] = self.representatives[clu_id] \
-                                                 + (instance_vec - self.representatives[clu_id]) \
-                                                 / self.cluster_size_dict[clu_id]
-                    continue
-            self.cluster_size_dict[len(self.representatives)] = 1
-            self.representatives.append(instance_vec)
+        self._stack_representatives()
+        num_clusters = len(self.representatives)
+        rep_matrix = np.zeros((max(2 * num_clusters, 16), X.shape[1]))
+        rep_norms = np.zeros(rep_matrix.shape[0])
+        if num_clusters > 0:
+            rep_matrix[:num_clusters] = self._rep_matrix
+            rep_norms[:num_clusters] = self._rep_norms
+
+        for start in range(self.num_bootstrap_samples, X.shape[0], self.batch_size):
+            X_batch = self._dense(X[start:start + self.batch_size, :])
+            # distances to the representatives as they were at the start of the mini-batch
+            num_fixed = num_clusters
+            batch_dist = self._cosine_dist(X_batch, rep_matrix[:num_fixed], rep_norms[:num_fixed])
+            # clusters updated or created within the mini-batch, whose distances must be recomputed
+            changed = []
+            for j, instance_vec in enumerate(X_batch):
+                i = start + j
+                if (i + 1) % 2000 == 0:
+                    print('Processed {} instances.'.format(i + 1))
+                if num_clusters > 0:
+                    dist = np.empty(num_clusters)
+                    dist[:num_fixed] = batch_dist[j]
+                    if changed:
+                        dist[changed] = self._cosine_dist(instance_vec[None, :], rep_matrix[changed],
+                                                          rep_norms[changed])[0]
+                    clu_id = int(np.argmin(dist))
+                    if dist[clu_id] <= self.max_dist:
+                        self.cluster_size_dict[clu_id] += 1
+                        rep_matrix[clu_id] += (instance_vec - rep_matrix[clu_id]) / self.cluster_size_dict[clu_id]
+                        rep_norms[clu_id] = LA.norm(rep_matrix[clu_id])
+                        if clu_id < num_fixed and clu_id not in changed:
+                            changed.append(clu_id)
+                        continue
+                if num_clusters == rep_matrix.shape[0]:
+                    rep_matrix = np.vstack([rep_matrix, np.zeros_like(rep_matrix)])
+                    rep_norms = np.concatenate([rep_norms, np.zeros_like(rep_norms)])
+                self.cluster_size_dict[num_clusters] = 1
+                rep_matrix[num_clusters] = instance_vec
+                rep_norms[num_clusters] = LA.norm(instance_vec)
+                changed.append(num_clusters)
+                num_clusters += 1
+
+        self._rep_matrix = rep_matrix[:num_clusters]
+        self._rep_norms = rep_norms[:num_clusters]
+        self.representatives = list(self._rep_matrix)
         print('Processed {} instances.'.format(X.shape[0]))
         print('Found {} clusters online.\n'.format(len(self.representatives)))
         # print('The representive vectors are:')
         # pprint.pprint(self.representatives.tolist())
 
+    def _stack_representatives(self):
+        if len(self.representatives) == 0:
+            self._rep_matrix, self._rep_norms = None, None
+            return
+        if self._rep_matrix is None or self._rep_matrix.shape[0] != len(self.representatives):
+            self._rep_matrix = np.array(self.representatives, dtype=float)
+            self._rep_norms = LA.norm(self._rep_matrix, axis=1)
+
+    @staticmethod
+    def _dense(X):
+        return X.toarray() if sp.issparse(X) else np.asarray(X, dtype=float)
+
+    @staticmethod
+    def _cosine_dist(X, rep_matrix, rep_norms):
+        """ Cosine distance of each row of X to each representative, as in _distance_metric
+        """
+        norm = LA.norm(X, axis=1)[:, None] * rep_norms[None, :]
+        dist = 1 - (X @ rep_matrix.T) / (norm + 1e-8)
+        dist[dist < 1e-8] = 0
+        return dist
+
     def _distance_metric(self, x1, x2):
         norm= LA.norm(x1) * LA.norm(x2)
         distance = 1 - np.dot(x1, x2) / (norm + 1e-8)
@@ -120,18 +184,10 @@ class LogClustering(object):
         return distance
 
     def _get_min_cluster_dist(self, instance_vec):
-        min_index = -1
-        min_dist = float('inf')
-        for i in range(len(self.representatives)):
-            cluster_rep = self.representatives[i]
-            dist = self._distance_metric(instance_vec, cluster_rep)
-            if dist < 1e-8:
-                min_dist = 0
-                min_index = i
-                break
-            elif dist < min_dist:
-                min_dist = dist
-                min_index = i
-        return min_dist, min_index
-
-
+        if len(self.representatives) == 0:
+            return float('inf'), -1
+        self._stack_representatives()
+        dist = self._cosine_dist(self._dense(instance_vec).reshape(1, -1), self._rep_matrix, self._rep_norms)[0]
+        # argmin returns the first minimum, like the sequential scan it replaces
+        min_index = int(np.argmin(dist))
+        return dist[min_index], min_index
@@ -12,6 +12,7 @@ import os
 import numpy as np
 import re
 from collections import Counter
+from scipy import sparse as sp
 from scipy.special import expit
 from itertools import compress
 from torch.utils.data import DataLoader, Dataset
@@ -54,8 +55,10 @@ class FeatureExtractor(object):
         self.term_weighting = None
         self.normalization = None
         self.oov = None
+        self.sparse = False
+        self.event_index = None
 
-    def fit_transform(self, X_seq, term_weighting=None, normalization=None, oov=False, min_count=1):
+    def fit_transform(self, X_seq, term_weighting=None, normalization=None, oov=False, min_count=1, sparse=False):
         """ Fit and transform the data matrix
 
         Arguments
@@ -65,6 +68,8 @@ class FeatureExtractor(object):
             normalization: None or `zero-mean`
             oov: bool, whether to use OOV event
             min_count: int, the minimal occurrence of events (default 0), only valid when oov=True.
+            sparse: bool, whether to return a scipy.sparse CSR matrix instead of a dense ndarray.
+                `zero-mean` normalization is not supported since it would densify the matrix.
 
         Returns
         -------
@@ -74,6 +79,9 @@ class FeatureExtractor(object):
         self.term_weighting = term_weighting
         self.normalization = normalization
         self.oov = oov
+        self.sparse = sparse
+        if self.sparse:
+            return self._sparse_fit_transform(X_seq, min_count)
 
         X_counts = []
         for i in range(X_seq.shape[0]):
@@ -122,6 +130,8 @@ class FeatureExtractor(object):
             X_new: The transformed data matrix
         """
         print('====== Transformed test data summary ======')
+        if self.sparse:
+            return self._sparse_transform(X_seq)
         X_counts = []
         for i in range(X_seq.shape[0]):
             event_counts = Counter(X_seq[i])
@@ -149,3 +159,69 @@ class FeatureExtractor(object):
         print('Test data shape: {}-by-{}\n'.format(X_new.shape[0], X_new.shape[1])) 
 
         return X_new
+
+    def _sparse_fit_transform(self, X_seq, min_count):
+        if self.normalization == 'zero-mean':
+            raise ValueError('zero-mean normalization is not supported with sparse=True')
+
+        # columns follow the order of first occurrence, as in the DataFrame of the dense path
+        self.event_index = {}
+        X, _ = self._count_matrix(X_seq, grow=True)
+        self.events = list(self.event_index)
+        if self.oov:
+            oov_vec = np.zeros(X.shape[0])
+            if min_count > 1:
+                idx = np.diff(X.tocsc().indptr) >= min_count
+                oov_vec = np.asarray((X[:, ~idx] > 0).sum(axis=1)).ravel()
+                X = X[:, idx]
+                self.events = np.array(self.events)[idx].tolist()
+                self.event_index = {event: col for col, event in enumerate(self.events)}
+            X = sp.hstack([X, sp.csr_matrix(oov_vec.reshape(-1, 1))], format='csr')
+
+        num_instance, num_event = X.shape
+        if self.term_weighting == 'tf-idf':
+            df_vec = np.asarray((X > 0).sum(axis=0)).ravel()
+            self.idf_vec = np.log(num_instance / (df_vec + 1e-8))
+        X_new = self._sparse_weight(X)
+
+        print('Train data shape: {}-by-{}\n'.format(X_new.shape[0], X_new.shape[1]))
+        return X_new
+
+    def _sparse_transform(self, X_seq):
+        X, oov_vec = self._count_matrix(X_seq, grow=False)
+        if self.oov:
+            X = sp.hstack([X, sp.csr_matrix(oov_vec.reshape(-1, 1))], format='csr')
+        X_new = self._sparse_weight(X)
+
+        print('Test data shape: {}-by-{}\n'.format(X_new.shape[0], X_new.shape[1]))
+        return X_new
+
+    def _count_matrix(self, X_seq, grow):
+        """ Build a CSR event-count matrix over self.event_index
+
+        Returns the matrix and, per instance, the number of distinct events not in self.event_index
+        """
+        indptr, indices, data = [0], [], []
+        unseen = np.zeros(X_seq.shape[0])
+        for i in range(X_seq.shape[0]):
+            for event, count in Counter(X_seq[i]).items():
+                col = self.event_index.get(event)
+                if col is None:
+                    if not grow:
+                        unseen[i] += 1
+                        continue
+                    col = self.event_index[event] = len(self.event_index)
+                indices.append(col)
+                data.append(count)
+            indptr.append(len(indices))
+        X = sp.csr_matrix((np.array(data, dtype=float), indices, indptr),
+                          shape=(X_seq.shape[0], len(self.event_index)))
+        return X, unseen
+
+    def _sparse_weight(self, X):
+        if self.term_weighting == 'tf-idf':
+            X = (X @ sp.diags(self.idf_vec)).tocsr()
+        X.eliminate_zeros()
+        if self.normalization == 'sigmoid':
+            X.data = expit(X.data)
+        return X
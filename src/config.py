@@ -25,6 +25,13 @@ class Settings(BaseSettings):
     # Detection
     THRESHOLD: float = Field(default=0.1, ge=0.0, le=1.0, description="Probability threshold for anomaly")
     ALERT_ANOMALY_COUNT: int = Field(default=2, ge=1, description="Minimum anomalies in window to alert")
+    DETECTION_RULE: Literal["threshold", "topg"] = Field(
+        default="threshold", description="Per-event rule: probability threshold or top-g candidates"
+    )
+    NUM_CANDIDATES: int = Field(default=6, ge=1, description="g for the top-g rule")
+    SEQ_THRESHOLD: float = Field(
+        default=0.5, ge=0.0, le=1.0, description="top-g rule: alert when undetected > window length * ratio"
+    )
 
     # Stream source
     STREAM_SOURCE: Literal["file", "stdin"] = Field(default="file", description="Log input source")
@@ -34,6 +41,15 @@ class Settings(BaseSettings):
     LOGBERT_MODEL_PATH: Optional[str] = Field(default=None, description="Path to external LogBERT checkpoint (best_bert.pth)")
     LOGBERT_VOCAB_PATH: Optional[str] = Field(default=None, description="Path to external LogBERT vocab.pkl")
     LOGBERT_DEVICE: Optional[str] = Field(default=None, description="Device for LogBERT real mode: cpu or cuda")
+    LOGBERT_SCORING: Literal["masked", "hypersphere", "cascade"] = Field(
+        default="masked", description="Window scoring strategy: masked LM, hypersphere distance, or both as a cascade"
+    )
+    LOGBERT_CENTER_PATH: Optional[str] = Field(
+        default=None, description="Path to best_center.pt (defaults to the checkpoint's directory)"
+    )
+    LOGBERT_CASCADE_RATIO: float = Field(
+        default=1.0, gt=0.0, description="Cascade runs masked scoring when distance > radius * ratio"
+    )
 
 
 # Singleton-style convenient accessor
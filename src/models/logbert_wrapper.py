@@ -1,10 +1,43 @@
 from __future__ import annotations
 
-import math
 import sys
 from hashlib import sha256
 from pathlib import Path
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+_SCORING_STRATEGIES = {"masked", "hypersphere", "cascade"}
+
+# Radius used by mock hypersphere scoring (mock distance lies in [0.01, 0.98])
+_MOCK_RADIUS = 0.6
+
+
+def topg_undetected(log_probs: Any, labels: Any, num_candidates: int) -> Any:
+    """Top-g rule: True where the label is not among the top `num_candidates` scores.
+
+    Parameters
+    - log_probs: (L, V) scores (log-probabilities or logits) as tensor or NumPy array
+    - labels: (L,) true key indices
+    - num_candidates: g, number of candidates accepted as normal
+
+    Returns
+    - (L,) boolean mask of the same kind as log_probs. For tensors, `topk` runs on
+      the input's device, so only the mask (never the (L, V) scores) needs to leave it.
+      Matches `Predictor.detect_logkey_anomaly` up to ordering among tied scores.
+    """
+    if num_candidates <= 0:
+        raise ValueError("num_candidates must be a positive integer")
+    g = min(int(num_candidates), log_probs.shape[-1])
+    if hasattr(log_probs, "topk"):  # torch.Tensor, duck-typed so torch stays optional
+        labels = labels.to(log_probs.device) if hasattr(labels, "topk") else log_probs.new_tensor(labels).long()
+        top = log_probs.topk(g, dim=-1).indices
+        return ~(top == labels.unsqueeze(-1)).any(dim=-1)
+
+    import numpy as np
+
+    scores = np.asarray(log_probs)
+    labels = np.asarray(labels)
+    top = np.argpartition(-scores, g - 1, axis=-1)[..., :g]
+    return ~(top == labels[..., None]).any(axis=-1)
 
 
 class LogBERTModel:
@@ -12,6 +45,13 @@ class LogBERTModel:
 
     - mode="mock": deterministic pseudo-probabilities for tests and demos.
     - mode="real": load external/logbert checkpoint and run masked-LM scoring in-process.
+
+    Scoring strategies (``scoring``):
+    - "masked": one masked forward per position (L forwards per window).
+    - "hypersphere": one unmasked forward per window; the window is flagged when the
+      DeepSVDD distance of its CLS embedding to ``center`` exceeds ``radius``.
+    - "cascade": hypersphere as a cheap first stage; masked scoring runs only on
+      windows whose distance exceeds ``radius * cascade_ratio``.
     """
 
     def __init__(
@@ -21,16 +61,29 @@ class LogBERTModel:
         model_path: Optional[str] = None,
         vocab_path: Optional[str] = None,
         device: Optional[str] = None,
+        scoring: str = "masked",
+        center_path: Optional[str] = None,
+        cascade_ratio: float = 1.0,
     ) -> None:
         mode = (mode or "mock").lower()
         if mode not in {"mock", "real"}:
             raise ValueError("mode must be 'mock' or 'real'")
         self.mode = mode
 
+        scoring = (scoring or "masked").lower()
+        if scoring not in _SCORING_STRATEGIES:
+            raise ValueError("scoring must be 'masked', 'hypersphere' or 'cascade'")
+        if cascade_ratio <= 0:
+            raise ValueError("cascade_ratio must be positive")
+        self.scoring = scoring
+        self.cascade_ratio = float(cascade_ratio)
+
         self._torch = None
         self._model = None
         self._vocab = None
         self._device = "cpu"
+        self._center = None
+        self.radius: float = _MOCK_RADIUS
 
         if self.mode == "real":
             self._setup_external_logbert()
@@ -53,11 +106,18 @@ class LogBERTModel:
             self._device = device or ("cuda" if self._torch.cuda.is_available() else "cpu")
 
             # Load model (torch.save(self.model) format) and vocab
-            self._model = self._torch.load(model_path, map_location=self._device)
+            self._model = self._torch.load(model_path, map_location=self._device, weights_only=False)
             self._model.to(self._device)
             self._model.eval()
             self._vocab = WordVocab.load_vocab(vocab_path)
 
+            if self.scoring != "masked":
+                # best_center.pt is saved next to best_bert.pth by the trainer
+                center_path = center_path or str(Path(model_path).with_name("best_center.pt"))
+                center_dict = self._torch.load(center_path, map_location=self._device)
+                self._center = self._torch.as_tensor(center_dict["center"], device=self._device).float()
+                self.radius = float(center_dict["radius"])
+
     def predict_probabilities(self, sequence_keys: List[str]) -> List[float]:
         """Return per-event probabilities for a sequence of log keys.
 
@@ -66,7 +126,68 @@ class LogBERTModel:
         """
         if self.mode == "mock":
             return [self._mock_probability_from_key(k) for k in sequence_keys]
-        return self._predict_real(sequence_keys)
+        return self._predict_real(sequence_keys)[0]
+
+    def predict_topg(self, sequence_keys: List[str], num_candidates: int) -> Tuple[List[float], List[bool]]:
+        """Return per-event probabilities and top-g "undetected" flags.
+
+        A key is undetected when it is not among the model's top `num_candidates`
+        predictions at its masked position (the offline evaluator's rule).
+
+        - Mock: undetected when p < 1/num_candidates (a key with p >= 1/g is always in the top g).
+        - Real: `topk` runs in the same masked forward, on the model's device.
+        """
+        if num_candidates <= 0:
+            raise ValueError("num_candidates must be a positive integer")
+        if self.mode == "mock":
+            probs = [self._mock_probability_from_key(k) for k in sequence_keys]
+            return probs, [p < 1.0 / num_candidates for p in probs]
+        return self._predict_real(sequence_keys, num_candidates)
+
+    def hypersphere_distances(self, windows: Sequence[Sequence[str]]) -> List[float]:
+        """Return the DeepSVDD distance of each window to the hypersphere center.
+
+        - Mock: 1 - mean mock probability of the window.
+        - Real: a single unmasked forward over the whole batch of windows.
+        """
+        if not windows:
+            return []
+        if self.mode == "mock":
+            return [
+                1.0 - sum(self._mock_probability_from_key(k) for k in w) / max(len(w), 1)
+                for w in windows
+            ]
+        return self._hypersphere_real(windows)
+
+    def score_window(self, sequence_keys: List[str], num_candidates: Optional[int] = None) -> Dict[str, Any]:
+        """Score a window with the configured strategy.
+
+        Returns a dict with
+        - distance: hypersphere distance (None for "masked")
+        - outside: True when distance > radius (False for "masked")
+        - probs: per-event probabilities, or None when masked scoring was skipped
+        - undetected: top-g flags when num_candidates is given and masked scoring ran, else None
+        """
+        result: Dict[str, Any] = {"distance": None, "outside": False, "probs": None, "undetected": None}
+        if self.scoring != "masked":
+            distance = self.hypersphere_distances([sequence_keys])[0]
+            result["distance"] = distance
+            result["outside"] = distance > self.radius
+            if self.scoring == "hypersphere" or distance <= self.radius * self.cascade_ratio:
+                return result
+
+        result.update(self.score_masked(sequence_keys, num_candidates))
+        return result
+
+    def score_masked(self, sequence_keys: List[str], num_candidates: Optional[int] = None) -> Dict[str, Any]:
+        """Masked scoring only, regardless of the configured strategy.
+
+        Returns a dict with probs and undetected (None unless num_candidates is given).
+        """
+        if num_candidates is None:
+            return {"probs": self.predict_probabilities(sequence_keys), "undetected": None}
+        probs, undetected = self.predict_topg(sequence_keys, num_candidates)
+        return {"probs": probs, "undetected": undetected}
 
     # ---------------- Mock helpers ----------------
     @staticmethod
@@ -87,7 +208,9 @@ class LogBERTModel:
         if str(ext) not in sys.path:
             sys.path.insert(0, str(ext))
 
-    def _predict_real(self, keys: List[str]) -> List[float]:
+    def _predict_real(
+        self, keys: List[str], num_candidates: Optional[int] = None
+    ) -> Tuple[List[float], List[bool]]:
         if self._model is None or self._vocab is None or self._torch is None:
             raise RuntimeError("Real model not initialized. Instantiate with mode='real' and valid paths.")
 
@@ -96,7 +219,12 @@ class LogBERTModel:
         L = len(ids)
         time_input = [0.0] * L
 
-        probs: List[float] = []
+        torch = self._torch
+        # Preallocated on the device and copied back with a single .tolist() after the loop;
+        # writing scalars in (rather than keeping views) frees each (1, L, V) output right away
+        log_p = torch.empty(L - 1, dtype=torch.float, device=self._device)
+        flags = torch.empty(L - 1, dtype=torch.bool, device=self._device)
+        labels = torch.tensor(ids, dtype=torch.long, device=self._device)
         for pos in range(1, L):  # skip SOS at 0
             masked_ids = ids.copy()
             true_id = masked_ids[pos]
@@ -109,7 +237,36 @@ class LogBERTModel:
             with self._torch.inference_mode():
                 out = self._model.forward(bert_input, time_tensor)
                 log_probs = out["logkey_output"]  # (1, L, V) in log-softmax
-                lp = float(log_probs[0, pos, true_id].item())
-                probs.append(math.exp(lp))
+                log_p[pos - 1] = log_probs[0, pos, true_id]
+                if num_candidates is not None:
+                    flags[pos - 1 : pos] = topg_undetected(
+                        log_probs[0, pos : pos + 1], labels[pos : pos + 1], num_candidates
+                    )
+
+        probs = log_p.double().exp().tolist()
+        undetected = flags.tolist() if num_candidates is not None else []
+        return probs, undetected
+
+    def _hypersphere_real(self, windows: Sequence[Sequence[str]]) -> List[float]:
+        if self._model is None or self._vocab is None or self._torch is None:
+            raise RuntimeError("Real model not initialized. Instantiate with mode='real' and valid paths.")
+        if self._center is None:
+            raise RuntimeError("Hypersphere center not loaded. Instantiate with scoring='hypersphere' or 'cascade'.")
+
+        torch = self._torch
+        rows = [
+            [self._vocab.sos_index] + [self._vocab.stoi.get(k, self._vocab.unk_index) for k in w]
+            for w in windows
+        ]
+        L = max(len(r) for r in rows)
+        # Right-pad with pad_index (0); BERT builds its attention mask from x > 0.
+        # Padded on the host so the whole batch is copied to the device once.
+        padded = [r + [self._vocab.pad_index] * (L - len(r)) for r in rows]
+        bert_input = torch.tensor(padded, dtype=torch.long).to(self._device)
+        time_tensor = torch.zeros((len(rows), L, 1), dtype=torch.float, device=self._device)
 
-        return probs
+        with torch.inference_mode():
+            out = self._model.forward(bert_input, time_tensor)
+            cls = out["cls_output"]  # (B, H)
+            dist = torch.sqrt(torch.sum((cls - self._center) ** 2, dim=1))
+        return dist.tolist()
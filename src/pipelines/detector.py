@@ -3,8 +3,15 @@ from __future__ import annotations
 """Simple anomaly detection helpers for LogBERT probabilities.
 
 Functions
-- detect_anomalies(sequence_keys, probs, threshold):
-    Returns a list of (index, original_key, probability) where probability < threshold.
+- detect_anomalies(sequence_keys, probs, threshold, *, undetected=None):
+    Returns a list of (index, original_key, probability) where probability < threshold,
+    or, when a top-g `undetected` mask is given, where the true key is not a candidate.
+
+- topg_undetected(log_probs, labels, num_candidates):
+    Top-g rule on a (L, V) score matrix; True where the label is outside the top-g.
+
+- sequence_is_anomalous(undetected_tokens, masked_tokens, seq_threshold):
+    Sequence-level rule of the offline evaluator (`compute_anomaly`).
 
 - should_alert(anomaly_count, alert_threshold):
     Returns True when the anomaly count meets or exceeds the alert threshold.
@@ -19,20 +26,39 @@ True
 False
 """
 
-from typing import List, Tuple
+from typing import Any, List, Tuple
+
+# Re-exported: the top-g rule lives with the model wrapper, which applies it on device
+from ..models.logbert_wrapper import topg_undetected  # noqa: F401
+
+
+def _is_tensor(x: Any) -> bool:
+    # Duck-typed so torch stays an optional dependency of this module
+    return hasattr(x, "detach") and hasattr(x, "topk")
+
+
+def _is_ndarray(x: Any) -> bool:
+    return hasattr(x, "__array__") and hasattr(x, "ndim") and not _is_tensor(x)
 
 
 def detect_anomalies(
     sequence_keys: list[str],
-    probs: list[float],
+    probs: Any,
     threshold: float,
+    *,
+    undetected: Any = None,
 ) -> list[tuple[int, str, float]]:
-    """Identify anomalous events by probability threshold.
+    """Identify anomalous events by probability threshold or top-g candidates.
 
     Parameters
     - sequence_keys: normalized log keys (templates) in sequence order
-    - probs: probability scores aligned with sequence_keys
+    - probs: probability scores aligned with sequence_keys (list, NumPy array or tensor)
     - threshold: probability cutoff; any p < threshold is flagged as anomaly
+    - undetected: optional top-g mask aligned with sequence_keys (see `topg_undetected`);
+      when given, positions where it is True are flagged and threshold is not applied
+
+    Arrays and tensors are compared in one vectorized op; only the flagged
+    indices and probabilities are copied back to Python.
 
     Returns
     - List of (index, original_key, probability) for anomalies
@@ -44,9 +70,21 @@ def detect_anomalies(
         raise ValueError(
             f"Length mismatch: sequence_keys={len(sequence_keys)} probs={len(probs)}"
         )
+    if undetected is not None and len(undetected) != len(probs):
+        raise ValueError(
+            f"Length mismatch: undetected={len(undetected)} probs={len(probs)}"
+        )
     if not (0.0 <= float(threshold) <= 1.0):
         raise ValueError("threshold must be within [0.0, 1.0]")
 
+    if _is_tensor(probs) or _is_ndarray(probs):
+        return _detect_vectorized(sequence_keys, probs, threshold, undetected)
+
+    if undetected is not None:
+        if _is_tensor(undetected) or _is_ndarray(undetected):
+            undetected = undetected.tolist()
+        return [(idx, sequence_keys[idx], float(probs[idx])) for idx, u in enumerate(undetected) if u]
+
     anomalies: List[Tuple[int, str, float]] = []
     for idx, (key, p) in enumerate(zip(sequence_keys, probs)):
         try:
@@ -58,6 +96,49 @@ def detect_anomalies(
     return anomalies
 
 
+def _detect_vectorized(
+    sequence_keys: list[str],
+    probs: Any,
+    threshold: float,
+    undetected: Any,
+) -> list[tuple[int, str, float]]:
+    if probs.ndim != 1:
+        raise ValueError(f"probs must be 1-D, got shape {tuple(probs.shape)}")
+    mask = (probs < threshold) if undetected is None else undetected
+    if _is_tensor(probs):
+        mask = (mask.to(probs.device) if _is_tensor(mask) else probs.new_tensor(mask)).bool()
+        idxs = mask.nonzero(as_tuple=True)[0].tolist()
+        vals = probs[mask].detach().double().tolist()
+    else:
+        import numpy as np
+
+        mask = np.asarray(mask.cpu() if _is_tensor(mask) else mask, dtype=bool)
+        idxs = np.flatnonzero(mask).tolist()
+        vals = np.asarray(probs, dtype=np.float64)[mask].tolist()
+    return [(i, sequence_keys[i], p) for i, p in zip(idxs, vals)]
+
+
+def sequence_is_anomalous(
+    undetected_tokens: Any,
+    masked_tokens: Any,
+    seq_threshold: float = 0.5,
+    *,
+    deepsvdd_label: Any = False,
+) -> Any:
+    """Sequence-level rule of the offline evaluator (`compute_anomaly`).
+
+    A sequence is anomalous when more than `seq_threshold` of its masked tokens are
+    undetected, or when it lies outside the DeepSVDD hypersphere. Accepts scalars or
+    aligned arrays/tensors (one element per sequence) and returns bool or a bool mask.
+    """
+    flagged = (undetected_tokens > masked_tokens * seq_threshold) | deepsvdd_label
+    if _is_tensor(flagged):
+        return flagged.bool()
+    if _is_ndarray(flagged):
+        return flagged.astype(bool)
+    return bool(flagged)
+
+
 def should_alert(anomaly_count: int, alert_threshold: int) -> bool:
     """Decide if an alert should be triggered.
 
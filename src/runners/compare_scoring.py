@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from ..config import settings
+from ..utils.logging_setup import get_logger
+from ..pipelines.log_parser import parse_raw_log
+from ..models.logbert_wrapper import LogBERTModel
+from .main import window_anomalies
+
+
+logger = get_logger("rt-compare")
+
+DEFAULT_BATCH = 64
+
+
+def _windows(path: Path, window_size: int) -> List[List[str]]:
+    """Build stride-1 sliding windows of parsed keys from a log file."""
+    with path.open("r", encoding="utf-8", errors="replace") as f:
+        keys = [parse_raw_log(line.rstrip("\n")) for line in f if line.strip()]
+    return [keys[i : i + window_size] for i in range(0, max(len(keys) - window_size + 1, 0))]
+
+
+def _masked_flags(model: LogBERTModel, windows: List[List[str]], num_candidates: Optional[int]) -> List[bool]:
+    """Window alerts from masked scoring, decided as in runners.main."""
+    return [window_anomalies(w, model.score_masked(w, num_candidates), settings)[1] for w in windows]
+
+
+def _hypersphere_flags(model: LogBERTModel, windows: List[List[str]], batch: int) -> List[bool]:
+    flags: List[bool] = []
+    for i in range(0, len(windows), batch):
+        flags += [d > model.radius for d in model.hypersphere_distances(windows[i : i + batch])]
+    return flags
+
+
+def _cascade_flags(
+    model: LogBERTModel, windows: List[List[str]], batch: int, num_candidates: Optional[int]
+) -> List[bool]:
+    """Batched hypersphere first stage; masked scoring only on suspicious windows."""
+    cutoff = model.radius * model.cascade_ratio
+    flags: List[bool] = []
+    for i in range(0, len(windows), batch):
+        chunk = windows[i : i + batch]
+        for w, d in zip(chunk, model.hypersphere_distances(chunk)):
+            if d <= cutoff:
+                flags.append(False)
+                continue
+            flags.append(window_anomalies(w, model.score_masked(w, num_candidates), settings)[1])
+    return flags
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Compare masked, hypersphere and cascade scoring on a log file.
+
+    Reports throughput (windows/s) per strategy and the window-level recall of
+    hypersphere/cascade against masked scoring, which is used as the reference.
+    Masked and cascade windows alert with the same rule as runners.main
+    (DETECTION_RULE); batch_size applies to the hypersphere pass of both the
+    hypersphere and cascade strategies.
+
+    Usage: python -m ..runners.compare_scoring [path] [batch_size]
+    """
+    if argv is None:
+        argv = sys.argv[1:]
+    cfg = settings
+    path = Path(argv[0]) if len(argv) >= 1 and argv[0] else Path(cfg.LOG_FILE_PATH)
+    batch = int(argv[1]) if len(argv) >= 2 and argv[1] else DEFAULT_BATCH
+
+    if not (path.exists() and path.is_file()):
+        logger.warning("Log file not found: %s", str(path))
+        return 1
+
+    if cfg.LOGBERT_MODEL_PATH and cfg.LOGBERT_VOCAB_PATH:
+        model = LogBERTModel(
+            mode="real",
+            model_path=cfg.LOGBERT_MODEL_PATH,
+            vocab_path=cfg.LOGBERT_VOCAB_PATH,
+            device=cfg.LOGBERT_DEVICE,
+            scoring="cascade",
+            center_path=cfg.LOGBERT_CENTER_PATH,
+            cascade_ratio=cfg.LOGBERT_CASCADE_RATIO,
+        )
+    else:
+        model = LogBERTModel(mode="mock", scoring="cascade", cascade_ratio=cfg.LOGBERT_CASCADE_RATIO)
+
+    windows = _windows(path, cfg.WINDOW_SIZE)
+    if not windows:
+        logger.warning("Not enough lines for a single window of %d", cfg.WINDOW_SIZE)
+        return 1
+
+    num_candidates = cfg.NUM_CANDIDATES if cfg.DETECTION_RULE == "topg" else None
+    runs: Dict[str, List[bool]] = {}
+    for name, fn in (
+        ("masked", lambda: _masked_flags(model, windows, num_candidates)),
+        ("hypersphere", lambda: _hypersphere_flags(model, windows, batch)),
+        ("cascade", lambda: _cascade_flags(model, windows, batch, num_candidates)),
+    ):
+        start = time.perf_counter()
+        runs[name] = fn()
+        elapsed = time.perf_counter() - start
+        logger.info(
+            "%-11s windows=%d flagged=%d elapsed=%.3fs throughput=%.1f win/s",
+            name,
+            len(windows),
+            sum(runs[name]),
+            elapsed,
+            len(windows) / elapsed if elapsed > 0 else float("inf"),
+        )
+
+    reference = runs["masked"]
+    positives = sum(reference)
+    for name in ("hypersphere", "cascade"):
+        hits = sum(1 for ref, got in zip(reference, runs[name]) if ref and got)
+        recall = hits / positives if positives else float("nan")
+        logger.info("%-11s recall vs masked=%.3f (%d/%d)", name, recall, hits, positives)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -2,14 +2,14 @@ from __future__ import annotations
 
 import sys
 from pathlib import Path
-from typing import Iterable
+from typing import Iterable, List, Tuple
 
 from ..config import settings
 from ..utils.logging_setup import get_logger
 from ..pipelines.window_buffer import SlidingWindowBuffer
 from ..pipelines.log_parser import parse_raw_log
 from ..models.logbert_wrapper import LogBERTModel
-from ..pipelines.detector import detect_anomalies, should_alert
+from ..pipelines.detector import detect_anomalies, sequence_is_anomalous, should_alert
 
 
 logger = get_logger("rt-runner")
@@ -32,13 +32,31 @@ def _iter_file(path: Path) -> Iterable[str]:
         return
 
 
+def window_anomalies(keys: List[str], score: dict, cfg=settings) -> Tuple[List[Tuple[int, str, float]], bool]:
+    """Apply the configured detection rule to a masked-scored window.
+
+    - threshold: alert when at least ALERT_ANOMALY_COUNT events have p < THRESHOLD.
+    - topg: alert on the offline sequence rule; every position of a real-time window
+      is masked, so masked_tokens = len(keys).
+    """
+    anomalies = detect_anomalies(keys, score["probs"], cfg.THRESHOLD, undetected=score["undetected"])
+    if cfg.DETECTION_RULE == "topg":
+        do_alert = sequence_is_anomalous(len(anomalies), len(keys), cfg.SEQ_THRESHOLD)
+    else:
+        do_alert = should_alert(len(anomalies), cfg.ALERT_ANOMALY_COUNT)
+    return anomalies, do_alert
+
+
 def run() -> int:
     # 1) Load config (already imported as settings)
     cfg = settings
     logger.info(
-        "Starting runner: window=%d, threshold=%.3f, alert_min=%d, source=%s",
+        "Starting runner: window=%d, rule=%s, threshold=%.3f, top-g=%d, seq_thr=%.2f, alert_min=%d, source=%s",
         cfg.WINDOW_SIZE,
+        cfg.DETECTION_RULE,
         cfg.THRESHOLD,
+        cfg.NUM_CANDIDATES,
+        cfg.SEQ_THRESHOLD,
         cfg.ALERT_ANOMALY_COUNT,
         cfg.STREAM_SOURCE,
     )
@@ -59,10 +77,13 @@ def run() -> int:
             model_path=cfg.LOGBERT_MODEL_PATH,
             vocab_path=cfg.LOGBERT_VOCAB_PATH,
             device=cfg.LOGBERT_DEVICE,
+            scoring=cfg.LOGBERT_SCORING,
+            center_path=cfg.LOGBERT_CENTER_PATH,
+            cascade_ratio=cfg.LOGBERT_CASCADE_RATIO,
         )
     else:
         logger.info("Initializing LogBERT mock mode (no external checkpoint configured)")
-        model = LogBERTModel(mode="mock")
+        model = LogBERTModel(mode="mock", scoring=cfg.LOGBERT_SCORING, cascade_ratio=cfg.LOGBERT_CASCADE_RATIO)
 
     # 3) Select input stream
     if (cfg.STREAM_SOURCE or "file").lower() == "stdin":
@@ -73,6 +94,12 @@ def run() -> int:
         it = _iter_file(path)
         logger.info("Reading input from file: %s", str(path))
 
+    # Cutoffs actually applied, for anomaly log lines
+    if cfg.DETECTION_RULE == "topg":
+        rule_desc = f"g={cfg.NUM_CANDIDATES} seq_thr={cfg.SEQ_THRESHOLD:.2f}"
+    else:
+        rule_desc = f"thr={cfg.THRESHOLD:.3f}"
+
     processed = 0
     for raw in it:
         processed += 1
@@ -81,16 +108,36 @@ def run() -> int:
 
         if window.size() >= cfg.WINDOW_SIZE:
             # 4) Perform detection on current window
-            probs = model.predict_probabilities(keys)
-            anomalies = detect_anomalies(keys, probs, cfg.THRESHOLD)
-            do_alert = should_alert(len(anomalies), cfg.ALERT_ANOMALY_COUNT)
+            num_candidates = cfg.NUM_CANDIDATES if cfg.DETECTION_RULE == "topg" else None
+            score = model.score_window(keys, num_candidates)
+            if score["probs"] is None:
+                # Hypersphere-only (or cascade filtered out): decide on the whole window
+                if score["outside"] and model.scoring == "hypersphere":
+                    logger.warning(
+                        "ALERT processed=%d window=%d dist=%.4f > radius=%.4f",
+                        processed,
+                        len(keys),
+                        score["distance"],
+                        model.radius,
+                    )
+                else:
+                    logger.info(
+                        "processed=%d window=%d dist=%.4f radius=%.4f",
+                        processed,
+                        len(keys),
+                        score["distance"],
+                        model.radius,
+                    )
+                continue
+
+            anomalies, do_alert = window_anomalies(keys, score, cfg)
 
             if anomalies:
                 # Keep concise list of indices with probs
                 preview = ", ".join(f"{idx}:{p:.3f}" for idx, _k, p in anomalies[:5])
                 msg = (
                     f"processed={processed} window={len(keys)} anomalies={len(anomalies)} "
-                    f"thr={cfg.THRESHOLD:.3f} [{preview}]"
+                    f"{rule_desc} [{preview}]"
                 )
                 if do_alert:
                     logger.warning("ALERT %s", msg)
@@ -98,10 +145,10 @@ def run() -> int:
                     logger.info("%s", msg)
             else:
                 logger.info(
-                    "processed=%d window=%d anomalies=0 thr=%.3f",
+                    "processed=%d window=%d anomalies=0 %s",
                     processed,
                     len(keys),
-                    cfg.THRESHOLD,
+                    rule_desc,
                 )
         else:
             logger.info("warming-up processed=%d window=%d/%d", processed, window.size(), cfg.WINDOW_SIZE)
@@ -3,14 +3,20 @@ from __future__ import annotations
 from pathlib import Path
 import sys
 
+import pytest
 
-# Ensure src/ is importable when running tests from project root
+
+# Ensure the project root is importable so `src` resolves as a package
 ROOT = Path(__file__).resolve().parents[1]
-SRC = ROOT / "src"
-if str(SRC) not in sys.path:
-    sys.path.insert(0, str(SRC))
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
 
-from ..pipelines.detector import detect_anomalies, should_alert  # noqa: E402
+from src.pipelines.detector import (  # noqa: E402
+    detect_anomalies,
+    sequence_is_anomalous,
+    should_alert,
+    topg_undetected,
+)
 
 
 def test_detect_anomalies_threshold():
@@ -25,6 +31,41 @@ def test_detect_anomalies_threshold():
     assert idxs == [1, 3, 5]
 
 
+def test_detect_anomalies_topg_mask():
+    keys = ["A", "B", "C"]
+    probs = [0.01, 0.5, 0.9]
+    # top-g flags override the threshold
+    anomalies = detect_anomalies(keys, probs, 0.1, undetected=[False, True, False])
+    assert anomalies == [(1, "B", 0.5)]
+
+
+def test_detect_anomalies_numpy_matches_list():
+    np = pytest.importorskip("numpy")
+    keys = [f"K{i}" for i in range(6)]
+    probs = [0.5, 0.05, 0.2, 0.09, 0.15, 0.01]
+    expected = detect_anomalies(keys, probs, 0.1)
+    got = detect_anomalies(keys, np.asarray(probs), 0.1)
+    assert [(i, k) for i, k, _p in got] == [(i, k) for i, k, _p in expected]
+    assert [p for *_x, p in got] == pytest.approx([p for *_x, p in expected])
+
+
+def test_topg_undetected_matches_argsort():
+    np = pytest.importorskip("numpy")
+    rng = np.random.default_rng(0)
+    scores = rng.normal(size=(20, 12))
+    labels = rng.integers(0, 12, size=20)
+    g = 3
+    expected = [int(lbl) not in np.argsort(-row)[:g] for row, lbl in zip(scores, labels)]
+    assert topg_undetected(scores, labels, g).tolist() == expected
+
+
+def test_sequence_is_anomalous():
+    # mirrors compute_anomaly: undetected > masked * seq_threshold
+    assert sequence_is_anomalous(3, 5, 0.5) is True
+    assert sequence_is_anomalous(2, 5, 0.5) is False
+    assert sequence_is_anomalous(0, 5, 0.5, deepsvdd_label=1) is True
+
+
 def test_should_alert():
     assert should_alert(2, 2) is True
     assert should_alert(1, 2) is False
@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+from pathlib import Path
+import sys
+
+import pytest
+
+
+# Ensure the project root is importable so `src` resolves as a package
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from src.models.logbert_wrapper import LogBERTModel  # noqa: E402
+
+
+def test_hypersphere_scoring_skips_masked():
+    model = LogBERTModel(mode="mock", scoring="hypersphere")
+    keys = ["A", "B", "C"]
+    score = model.score_window(keys)
+
+    assert score["probs"] is None
+    assert score["distance"] == model.hypersphere_distances([keys])[0]
+    assert score["outside"] == (score["distance"] > model.radius)
+
+
+def test_cascade_runs_masked_only_on_suspicious_windows():
+    keys = ["A", "B", "C"]
+    strict = LogBERTModel(mode="mock", scoring="cascade", cascade_ratio=1e-6)
+    loose = LogBERTModel(mode="mock", scoring="cascade", cascade_ratio=1e6)
+
+    assert strict.score_window(keys)["probs"] == strict.predict_probabilities(keys)
+    assert loose.score_window(keys)["probs"] is None
+
+
+def test_invalid_scoring():
+    with pytest.raises(ValueError):
+        LogBERTModel(mode="mock", scoring="nope")
+
+
+@pytest.fixture
+def real_checkpoint(tmp_path):
+    """Tiny BERTLog checkpoint with vocab and hypersphere center, as the trainer saves them."""
+    torch = pytest.importorskip("torch")
+    ext = ROOT / "external" / "logbert"
+    if str(ext) not in sys.path:
+        sys.path.insert(0, str(ext))
+    pytest.importorskip("bert_pytorch")
+    from bert_pytorch.dataset import WordVocab
+    from bert_pytorch.model import BERT, BERTLog
+
+    vocab = WordVocab([["A", "B", "C", "D", "E"]])
+    vocab.save_vocab(str(tmp_path / "vocab.pkl"))
+    torch.manual_seed(0)
+    model = BERTLog(BERT(len(vocab), max_len=64, hidden=16, n_layers=1, attn_heads=2), len(vocab)).eval()
+    torch.save(model, tmp_path / "best_bert.pth")
+    center = torch.randn(16)
+    torch.save({"center": center, "radius": 1.0}, tmp_path / "best_center.pt")
+    return tmp_path, model, vocab, center
+
+
+def _reference_distance(model, vocab, center, keys):
+    """Unpadded single-window distance, as in Predictor.helper."""
+    import torch
+
+    ids = [vocab.sos_index] + [vocab.stoi.get(k, vocab.unk_index) for k in keys]
+    with torch.no_grad():
+        out = model(torch.tensor([ids]), torch.zeros(1, len(ids), 1))
+        return torch.sqrt(torch.sum((out["cls_output"][0] - center) ** 2)).item()
+
+
+def test_real_hypersphere_distances_match_predictor(real_checkpoint):
+    path, model, vocab, center = real_checkpoint
+    wrapper = LogBERTModel(
+        mode="real",
+        model_path=str(path / "best_bert.pth"),
+        vocab_path=str(path / "vocab.pkl"),
+        device="cpu",
+        scoring="hypersphere",
+    )
+    assert wrapper.radius == 1.0
+
+    # different lengths, so the batch is padded; "Z" is out of vocabulary
+    windows = [["A", "B"], ["C", "D", "A", "Z", "E"], ["B"]]
+    expected = [_reference_distance(model, vocab, center, w) for w in windows]
+    assert wrapper.hypersphere_distances(windows) == pytest.approx(expected, rel=1e-5)
+
+
+def test_real_cascade_runs_masked_only_above_ratio(real_checkpoint):
+    path, model, vocab, center = real_checkpoint
+    keys = ["A", "B", "C"]
+    distance = _reference_distance(model, vocab, center, keys)
+
+    def cascade(ratio):
+        return LogBERTModel(
+            mode="real",
+            model_path=str(path / "best_bert.pth"),
+            vocab_path=str(path / "vocab.pkl"),
+            device="cpu",
+            scoring="cascade",
+            cascade_ratio=ratio,
+        )
+
+    # radius is 1.0, so the first-stage cutoff is the ratio itself
+    below = cascade(distance * 2).score_window(keys)
+    assert below["probs"] is None
+    assert below["distance"] == pytest.approx(distance, rel=1e-5)
+
+    suspicious = cascade(distance / 2)
+    above = suspicious.score_window(keys, num_candidates=2)
+    assert above["probs"] == pytest.approx(suspicious.predict_probabilities(keys))
+    assert above["undetected"] == suspicious.predict_topg(keys, 2)[1]
+    assert above["outside"] == (distance > 1.0)
@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+from pathlib import Path
+import sys
+
+import pytest
+
+np = pytest.importorskip("numpy")
+torch = pytest.importorskip("torch")
+pytest.importorskip("pandas")
+pytest.importorskip("tqdm")
+
+
+# Ensure external/logbert is importable when running tests from project root
+ROOT = Path(__file__).resolve().parents[1]
+EXT = ROOT / "external" / "logbert"
+if str(EXT) not in sys.path:
+    sys.path.insert(0, str(EXT))
+
+from torch.utils.data import DataLoader  # noqa: E402
+
+from logdeep.dataset.log import log_dataset  # noqa: E402
+from logdeep.dataset.sample import sliding_window  # noqa: E402
+from logdeep.dataset.vocab import Vocab  # noqa: E402
+from logdeep.models.lstm import Deeplog, loganomaly  # noqa: E402
+from logdeep.tools.predict import Predicter  # noqa: E402
+
+
+WINDOW_SIZE = 5
+NUM_CANDIDATES = 3
+
+
+def _sessions():
+    rng = np.random.default_rng(0)
+    # shorter than, equal to and much longer than the window, so windows of one
+    # session span several predict_batch_size batches
+    lengths = [2, 3, 5, 6, 60, 4, 17, 1 + WINDOW_SIZE, 45, 2] + rng.integers(2, 30, size=30).tolist()
+    return [" ".join(str(k) for k in rng.integers(1, 9, size=n)) + "\n" for n in lengths]
+
+
+def _options(quantitatives, vocab, test_ratio, predict_batch_size):
+    return dict(output_dir="", device="cpu", model_path="", window_size=WINDOW_SIZE,
+                num_candidates=NUM_CANDIDATES, num_classes=len(vocab), input_size=1,
+                sequentials=True, quantitatives=quantitatives, semantics=False, parameters=False,
+                batch_size=128, threshold=None, gaussian_mean=0, gaussian_std=0, save_dir="",
+                is_logkey=True, is_time=False, vocab_path="", min_len=0, test_ratio=test_ratio,
+                predict_batch_size=predict_batch_size)
+
+
+def _per_session_reference(predicter, model, data, vocab, rand_index):
+    """The per-line loop predict_unsupervised used before batching."""
+    results = []
+    for idx, line in enumerate(data):
+        if idx not in rand_index:
+            continue
+        logkeys, times = Predicter.parse_session(line)
+        logs, labels = sliding_window(([logkeys], [times]), vocab, window_size=WINDOW_SIZE, is_train=False)
+        dataset = log_dataset(logs=logs, labels=labels, seq=predicter.sequentials,
+                              quan=predicter.quantitatives, sem=predicter.semantics,
+                              param=predicter.parameters)
+        num_anomaly, num_predicted = 0, 0
+        for log, label in DataLoader(dataset, batch_size=min(len(dataset), 128)):
+            output = model(features=list(log.values()), device="cpu")
+            num_predicted += len(label)
+            for i in range(len(label)):
+                if label[i] not in torch.argsort(output[i])[-NUM_CANDIDATES:]:
+                    num_anomaly += 1
+        results.append({"logkey_anomaly": num_anomaly, "predicted_logkey": num_predicted})
+    return results
+
+
+@pytest.mark.parametrize("quantitatives, model_cls", [(False, Deeplog), (True, loganomaly)])
+@pytest.mark.parametrize("predict_batch_size", [1, 16, 4096])
+def test_batched_predictor_matches_per_session_loop(quantitatives, model_cls, predict_batch_size):
+    data = _sessions()
+    vocab = Vocab(data)
+    torch.manual_seed(0)
+    model = model_cls(input_size=1, hidden_size=8, num_layers=1, vocab_size=len(vocab), embedding_dim=4).eval()
+    predicter = Predicter(model, _options(quantitatives, vocab, 0.8, predict_batch_size))
+
+    torch.manual_seed(1)
+    rand_index = torch.randperm(len(data))[:int(len(data) * 0.8)]
+    with torch.no_grad():
+        expected = _per_session_reference(predicter, model, data, vocab, rand_index)
+
+    torch.manual_seed(1)
+    got, _ = predicter.unsupervised_helper(model, data, vocab, "test")
+
+    assert got == expected
+    assert sum(r["logkey_anomaly"] for r in got) > 0
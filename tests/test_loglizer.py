@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+from itertools import product
+from pathlib import Path
+import sys
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("scipy")
+pytest.importorskip("pandas")
+pytest.importorskip("sklearn")
+pytest.importorskip("torch")
+
+
+# Ensure external/logbert is importable when running tests from project root
+ROOT = Path(__file__).resolve().parents[1]
+EXT = ROOT / "external" / "logbert"
+if str(EXT) not in sys.path:
+    sys.path.insert(0, str(EXT))
+
+from loglizer.models import LogClustering  # noqa: E402
+from loglizer.preprocessing import FeatureExtractor  # noqa: E402
+
+
+def _sequences(n, num_events, seed):
+    rng = np.random.default_rng(seed)
+    X_seq = np.empty(n, dtype=object)
+    for i in range(n):
+        # skewed event frequencies so that some events fall under min_count
+        events = rng.zipf(1.6, size=rng.integers(1, 20))
+        X_seq[i] = ["E{}".format(e) for e in events if e < num_events] or ["E1"]
+    return X_seq
+
+
+@pytest.mark.parametrize(
+    "term_weighting, oov, min_count, normalization",
+    list(product([None, "tf-idf"], [False, True], [1, 3], [None, "sigmoid"])),
+)
+def test_sparse_feature_extractor_matches_dense(term_weighting, oov, min_count, normalization):
+    # the test set draws from a wider event range, so it contains unseen events
+    X_train, X_test = _sequences(400, 30, seed=0), _sequences(200, 60, seed=1)
+    dense, sparse = FeatureExtractor(), FeatureExtractor()
+
+    expected = dense.fit_transform(X_train, term_weighting, normalization, oov, min_count)
+    got = sparse.fit_transform(X_train, term_weighting, normalization, oov, min_count, sparse=True)
+    assert list(sparse.events) == list(dense.events)
+    np.testing.assert_allclose(got.toarray(), expected)
+
+    np.testing.assert_allclose(sparse.transform(X_test).toarray(), dense.transform(X_test))
+
+
+def test_sparse_feature_extractor_rejects_zero_mean():
+    with pytest.raises(ValueError):
+        FeatureExtractor().fit_transform(_sequences(10, 5, seed=0), normalization="zero-mean", sparse=True)
+
+
+def _sequential_min_dist(model, representatives, instance_vec):
+    """The per-representative scan _get_min_cluster_dist used before vectorization."""
+    min_index = -1
+    min_dist = float('inf')
+    for i, cluster_rep in enumerate(representatives):
+        dist = model._distance_metric(instance_vec, cluster_rep)
+        if dist < 1e-8:
+            return 0, i
+        elif dist < min_dist:
+            min_dist = dist
+            min_index = i
+    return min_dist, min_index
+
+
+def _sequential_reference(X, X_test, **params):
+    model = LogClustering(**params)
+    if model.num_bootstrap_samples > 0:
+        model._offline_clustering(X[:model.num_bootstrap_samples])
+    representatives = list(model.representatives)
+    sizes = dict(model.cluster_size_dict)
+    for instance_vec in X[model.num_bootstrap_samples:]:
+        if representatives:
+            min_dist, clu_id = _sequential_min_dist(model, representatives, instance_vec)
+            if min_dist <= model.max_dist:
+                sizes[clu_id] += 1
+                representatives[clu_id] = representatives[clu_id] \
+                    + (instance_vec - representatives[clu_id]) / sizes[clu_id]
+                continue
+        sizes[len(representatives)] = 1
+        representatives.append(instance_vec)
+    y_pred = [int(_sequential_min_dist(model, representatives, x)[0] > model.anomaly_threshold) for x in X_test]
+    return representatives, sizes, y_pred
+
+
+@pytest.mark.parametrize("num_bootstrap_samples", [0, 50])
+@pytest.mark.parametrize("batch_size", [1, 1000])
+@pytest.mark.parametrize("as_sparse", [False, True])
+def test_online_clustering_matches_sequential_scan(num_bootstrap_samples, batch_size, as_sparse):
+    extractor = FeatureExtractor()
+    # few distinct events, so exact duplicates (distance 0) are common
+    X = extractor.fit_transform(_sequences(600, 8, seed=2), term_weighting="tf-idf", sparse=True)
+    X_test = extractor.transform(_sequences(300, 12, seed=3))
+    params = dict(max_dist=0.2, anomaly_threshold=0.2, num_bootstrap_samples=num_bootstrap_samples)
+
+    representatives, sizes, y_pred = _sequential_reference(X.toarray(), X_test.toarray(), **params)
+
+    model = LogClustering(batch_size=batch_size, **params)
+    model.fit(X if as_sparse else X.toarray())
+    assert model.cluster_size_dict == sizes
+    np.testing.assert_allclose(np.array(model.representatives), np.array(representatives))
+    assert model.predict(X_test if as_sparse else X_test.toarray()).tolist() == y_pred
+
+    x = X_test.toarray()[0]
+    assert model._get_min_cluster_dist(x) == pytest.approx(_sequential_min_dist(model, representatives, x))